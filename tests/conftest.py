@@ -0,0 +1,37 @@
+import os
+import tempfile
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+
+def seeded(block_cls, seed=0, **kwargs):
+    """block instance built with a fixed seed, so that separate processes build the same parameters"""
+    torch.manual_seed(seed)
+    return block_cls(**kwargs)
+
+
+def _run_rank(rank, function, world_size, init_file, results_dir, args):
+    dist.init_process_group('gloo', init_method=f'file://{init_file}', rank=rank, world_size=world_size)
+    try:
+        torch.save(function(rank, *args), os.path.join(results_dir, f'{rank}.pt'))
+    finally:
+        dist.destroy_process_group()
+
+
+def spawn_gather(function, world_size, *args):
+    """
+    runs function(rank, *args) in world_size processes of a gloo process group and gathers their results (which
+    should be serializable with torch.save), the function should be importable from the spawned processes.
+    """
+    with tempfile.TemporaryDirectory() as results_dir:
+        mp.spawn(
+            _run_rank, args=(function, world_size, os.path.join(results_dir, 'init'), results_dir, args),
+            nprocs=world_size)
+        return [torch.load(os.path.join(results_dir, f'{rank}.pt')) for rank in range(world_size)]
+
+
+@pytest.fixture
+def spawn():
+    return spawn_gather
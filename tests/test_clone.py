@@ -0,0 +1,48 @@
+import torch
+from vivid.nn.block.instance import Block
+from conftest import seeded
+
+
+def build():
+    cls = Block(name='MLP', fc1=torch.nn.Linear, act=torch.nn.ReLU, fc2=torch.nn.Linear, norm=torch.nn.BatchNorm1d)
+    return seeded(
+        cls, fc1_in_features=4, fc1_out_features=8, fc2_in_features=8, fc2_out_features=3, norm_num_features=3)
+
+
+def test_clone_shared_parameters():
+    block = build()
+    clone = block.clone(share_parameters=True)
+    assert clone is not block and clone.fc1 is not block.fc1
+    for (name, param), (_, cloned) in zip(block.named_parameters(), clone.named_parameters()):
+        assert cloned is param, name
+    for buffer, cloned in zip(block.buffers(), clone.buffers()):
+        assert cloned is buffer
+
+
+def test_clone_independent_parameters():
+    block = build()
+    clone = block.clone()
+    for param, cloned in zip(block.parameters(), clone.parameters()):
+        assert cloned is not param and cloned.data_ptr() != param.data_ptr()
+        assert torch.equal(cloned, param)
+    with torch.no_grad():
+        clone.fc1.weight.add_(1.)
+    assert not torch.equal(clone.fc1.weight, block.fc1.weight)
+    inputs = torch.randn(5, 4)
+    block.eval(), clone.eval()
+    assert clone.fc2(torch.ones(1, 8)).shape == (1, 3)
+    assert block(inputs).shape == clone(inputs).shape
+
+
+def test_clone_reset_parameters():
+    block = build()
+    clone = block.clone(reset_parameters=True)
+    assert not torch.equal(clone.fc1.weight, block.fc1.weight)
+    assert clone.block_names == block.block_names
+
+
+def test_untied_repeat_slots_are_built_independently():
+    block = Block(name='Stack', lin=torch.nn.Linear, repeat_count=3)(in_features=4, out_features=4)
+    weights = [getattr(block, f'block-{i}').lin.weight for i in range(3)]
+    assert len({weight.data_ptr() for weight in weights}) == 3
+    assert not torch.equal(weights[0], weights[1])
@@ -0,0 +1,70 @@
+import copy
+import gc
+import pickle
+import pytest
+import torch
+from vivid.nn.block import block as block_module
+from vivid.nn.block.instance import Block
+from vivid.utilities.variables import ArgDescription
+
+
+def test_descriptions_are_immutable():
+    description = ArgDescription(kind='NORMAL', default=1)
+    with pytest.raises(AttributeError):
+        description.default = 2
+    with pytest.raises(TypeError):
+        description['default'] = 2
+    assert description.replace(default=2)['default'] == 2 and description['default'] == 1
+
+
+def test_mapping_interface():
+    description = ArgDescription(kind='VAR', lookup=['width'], var_cls=True)
+    assert dict(description) == dict(kind='VAR', lookup=('width',), VAR_CLS=True)
+    assert 'default' not in description and description.get('default', 3) == 3
+    with pytest.raises(KeyError):
+        _ = description['default']
+
+
+def test_nested_descriptions_share_child_records():
+    inner = Block(name='Inner', lin=torch.nn.Linear)
+    outer = Block(name='Outer', inner=inner)
+    nested, = outer._args_table['in_features']
+    child, = inner._args_table['in_features']
+    assert nested['block'] == ('inner', 'lin') and child['block'] == ('lin',)
+    assert nested.base is child
+    # constructor descriptions are shared among the blocks using the same module class
+    assert child.base is Block(name='Other', lin=torch.nn.Linear)._args_table['in_features'][0].base
+
+
+def test_parameters_descriptions_cache_is_weak():
+    class Module(torch.nn.Module):
+        def __init__(self, width=3):
+            super(Module, self).__init__()
+
+    Block(name='Temporary', module=Module)
+    assert Module in block_module._parameters_descriptions_cache
+    size = len(block_module._parameters_descriptions_cache)
+    del Module
+    gc.collect()
+    assert len(block_module._parameters_descriptions_cache) == size - 1
+
+
+@pytest.mark.parametrize('copier', [copy.copy, copy.deepcopy, lambda value: pickle.loads(pickle.dumps(value))])
+def test_descriptions_copy_and_pickle(copier):
+    inner = Block(name='PicklableInner', lin=torch.nn.Linear)
+    outer = Block(name='PicklableOuter', inner=inner)
+    description = ArgDescription(kind='VAR', default=2, lookup=['width'])
+    nested, = outer._args_table['in_features']
+    for value in (description, nested):
+        copied = copier(value)
+        assert type(copied) is type(value) and dict(copied) == dict(value)
+        assert 'active' not in copied
+    # variables are compared by identity, their representations are compared instead
+    table = copier(dict(outer._args_table))
+    assert repr(table) == repr(dict(outer._args_table))
+
+
+def test_descriptions_repr_type():
+    nested, = Block(name='ReprOuter', inner=Block(name='ReprInner', lin=torch.nn.Linear))._args_table['in_features']
+    assert repr(nested).startswith('PrefixedArgDescription(')
+    assert repr(nested.base.base).startswith('ArgDescription(')
@@ -0,0 +1,96 @@
+import torch
+from vivid.nn.block.instance import Block
+from vivid.nn.block.distributed import BlockDataParallel, block_units, units_parameters
+from conftest import seeded
+
+WORLD_SIZE = 2
+
+
+def build():
+    inner = Block(name='Inner', lin=torch.nn.Linear, act=torch.nn.Tanh)
+    stack = Block(name='Stack', inner=inner, repeat_count=4, repeat_tied=2)
+    model = Block(name='Model', stack=stack, head=torch.nn.Linear)
+    return seeded(model, stack_in_features=4, stack_out_features=4, head_in_features=4, head_out_features=2)
+
+
+def batch():
+    generator = torch.Generator().manual_seed(1)
+    return torch.randn(8, 4, generator=generator), torch.randn(8, 2, generator=generator)
+
+
+def run_rank(rank):
+    # different initializations on each rank are synchronized by the wrapper
+    model = build()
+    if rank:
+        with torch.no_grad():
+            for param in model.parameters():
+                param.add_(1.)
+    parallel = BlockDataParallel(model, bucket_cap_mb=1e-4)
+    inputs, targets = batch()
+    inputs, targets = inputs.chunk(WORLD_SIZE)[rank], targets.chunk(WORLD_SIZE)[rank]
+    torch.nn.functional.mse_loss(parallel(inputs), targets).backward()
+    return {name: param.grad for name, param in model.named_parameters()}
+
+
+def rank_loss(model, rank, inputs, targets):
+    # the head is left unused on the second rank
+    if rank:
+        return model.stack(inputs).pow(2).mean()
+    return torch.nn.functional.mse_loss(model(inputs), targets)
+
+
+def run_rank_unused(rank):
+    model = build()
+    parallel = BlockDataParallel(model, bucket_cap_mb=1e-4)
+    inputs, targets = batch()
+    rank_loss(parallel.module, rank, inputs.chunk(WORLD_SIZE)[rank], targets.chunk(WORLD_SIZE)[rank]).backward()
+    return {name: param.grad for name, param in model.named_parameters()}
+
+
+def run_rank_buffers(rank):
+    # running statistics are left untouched by the forward passes (zero momentum)
+    model = seeded(Block(name='Normed', norm=torch.nn.BatchNorm1d), num_features=4, momentum=0.)
+    model.norm.running_mean.fill_(rank + 1)
+    parallel = BlockDataParallel(model)
+    built = model.norm.running_mean.clone()
+    model.norm.running_var.fill_(rank + 1)
+    parallel(torch.randn(4, 4))
+    return dict(built=built, running_var=model.norm.running_var)
+
+
+def test_units_follow_hierarchy():
+    model = build()
+    units = block_units(model)
+    assert [name for name, _ in units] == ['stack.block-0', 'stack.block-1', 'head']
+    # tied repetitions reuse the slot parameters which are only assigned once
+    params = units_parameters(model, units)
+    assert sum(len(value) for value in params.values()) == len(list(model.parameters()))
+
+
+def test_gradients_match_single_process(spawn):
+    model = build()
+    inputs, targets = batch()
+    torch.nn.functional.mse_loss(model(inputs), targets).backward()
+
+    gradients = spawn(run_rank, WORLD_SIZE)
+    for name, param in model.named_parameters():
+        for rank_gradients in gradients:
+            assert torch.allclose(rank_gradients[name], param.grad, atol=1e-6), name
+
+
+def test_unused_parameters_on_some_ranks(spawn):
+    model = build()
+    inputs, targets = batch()
+    for rank in range(WORLD_SIZE):
+        rank_loss(model, rank, inputs.chunk(WORLD_SIZE)[rank], targets.chunk(WORLD_SIZE)[rank]).backward()
+
+    gradients = spawn(run_rank_unused, WORLD_SIZE)
+    for name, param in model.named_parameters():
+        for rank_gradients in gradients:
+            assert torch.allclose(rank_gradients[name], param.grad / WORLD_SIZE, atol=1e-6), name
+
+
+def test_buffers_are_broadcast(spawn):
+    for result in spawn(run_rank_buffers, WORLD_SIZE):
+        # buffers of the first rank are broadcast when wrapping the module and before each training forward
+        assert torch.equal(result['built'], torch.ones(4)) and torch.equal(result['running_var'], torch.ones(4))
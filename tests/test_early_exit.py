@@ -0,0 +1,60 @@
+import torch
+from vivid.nn.block.instance import Block
+
+
+def shifted_stack(count=3, connection=None):
+    """repeat stack where every slot adds one to its inputs and exit heads are identities"""
+    cls = Block(
+        name='Stack', lin=torch.nn.Linear, repeat_count=count, repeat_exit=torch.nn.Linear, connection_kind=connection)
+    block = cls(in_features=4, out_features=4, repeat_exit_in_features=4, repeat_exit_out_features=4)
+    with torch.no_grad():
+        for name, module in block.named_modules():
+            if isinstance(module, torch.nn.Linear):
+                module.weight.copy_(torch.eye(4))
+                module.bias.fill_(0. if name.startswith('exit') else 1.)
+    return block
+
+
+def test_repeat_forward():
+    block = shifted_stack()
+    inputs = torch.zeros(2, 4)
+    assert torch.allclose(block(inputs), inputs + 3)
+
+
+def test_early_exit_depths():
+    block = shifted_stack()
+    batch_sizes = []
+    for i in range(3):
+        getattr(block, f'block-{i}').register_forward_hook(
+            lambda module, inputs, outputs: batch_sizes.append(inputs[0].shape[0]))
+
+    inputs = torch.zeros(4, 4)
+    inputs[:, 0] = torch.tensor([2., 1., 0., -5.])
+    outputs, depths = block.early_exit(inputs, halting=lambda outputs: outputs[:, 0] >= 3)
+
+    assert depths.tolist() == [1, 2, 3, 3]
+    assert torch.allclose(outputs, inputs + depths[:, None].float())
+    # halted samples are removed from the batch
+    assert batch_sizes == [4, 3, 2]
+
+
+def test_early_exit_without_halting_runs_all_slots():
+    block = shifted_stack()
+    inputs = torch.zeros(2, 4)
+    outputs, depths = block.early_exit(inputs)
+    assert depths.tolist() == [3, 3]
+    assert torch.allclose(outputs, block(inputs))
+
+
+def test_early_exit_applies_block_connection():
+    block = shifted_stack(connection='residual')
+    inputs = torch.zeros(3, 4)
+    inputs[:, 0] = torch.tensor([1., .5, -5.])
+    outputs, depths = block.early_exit(inputs)
+    assert depths.tolist() == [3, 3, 3]
+    assert torch.allclose(outputs, block(inputs)) and torch.allclose(outputs, 2 * inputs + 3)
+
+    # intermediate exits see the slot outputs connected to the (compacted) block inputs
+    outputs, depths = block.early_exit(inputs, halting=lambda outputs: outputs[:, 0] >= 3)
+    assert depths.tolist() == [1, 2, 3]
+    assert torch.allclose(outputs, 2 * inputs + depths[:, None].float())
@@ -0,0 +1,68 @@
+import pytest
+import torch
+from vivid.nn.block.instance import Block
+from vivid.nn.block.pipeline import PipelineStage, partition_units
+from conftest import seeded
+
+NUM_STAGES = 3
+
+
+def block_cls(connection=None):
+    inner = Block(name='Inner', lin=torch.nn.Linear, act=torch.nn.Tanh)
+    return Block(name='Stack', inner=inner, repeat_count=6, connection_kind=connection)
+
+
+def build(connection=None):
+    return seeded(block_cls(connection), in_features=4, out_features=4)
+
+
+def batch():
+    generator = torch.Generator().manual_seed(1)
+    return torch.randn(10, 4, generator=generator), torch.randn(10, 4, generator=generator)
+
+
+def batch_targets(connection):
+    inputs, targets = batch()
+    # dense connections concatenate the block inputs to its outputs
+    return inputs, torch.cat([targets, targets], dim=-1) if connection == 'dense' else targets
+
+
+def run_stage(rank, schedule, meta, connection):
+    reference = build(connection)
+    if meta:
+        stage = PipelineStage.from_block(block_cls(connection), in_features=4, out_features=4)
+        for name, unit in zip(stage.unit_names, stage.units):
+            unit.load_state_dict(getattr(reference, name).state_dict())
+    else:
+        stage = PipelineStage(reference)
+    inputs, targets = batch_targets(connection)
+    loss = stage.train_step(
+        inputs=inputs, targets=targets, loss_function=torch.nn.functional.mse_loss, num_micro_batches=4,
+        schedule=schedule)
+    gradients = {
+        f'{name}.{param_name}': param.grad for name, unit in zip(stage.unit_names, stage.units) for
+        param_name, param in unit.named_parameters()}
+    return dict(loss=loss, gradients=gradients)
+
+
+def test_partition_units():
+    assert partition_units([1, 1, 1, 10, 1, 1, 1, 1], 3) == [(0, 3), (3, 4), (4, 8)]
+    assert partition_units([5, 5, 5, 5], 4) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+
+
+@pytest.mark.parametrize('schedule,meta,connection,num_stages', [
+    ('gpipe', False, None, NUM_STAGES), ('1f1b', False, None, NUM_STAGES), ('1f1b', True, None, NUM_STAGES),
+    ('1f1b', False, 'residual', NUM_STAGES), ('gpipe', False, 'dense', 2), ('1f1b', True, 'residual', 2),
+])
+def test_pipeline_matches_single_process(spawn, schedule, meta, connection, num_stages):
+    model = build(connection)
+    inputs, targets = batch_targets(connection)
+    loss = torch.nn.functional.mse_loss(model(inputs), targets)
+    loss.backward()
+
+    results = spawn(run_stage, num_stages, schedule, meta, connection)
+    assert results[0]['loss'] is None and results[-1]['loss'] == pytest.approx(loss.item(), rel=1e-5)
+    gradients = {name: grad for result in results for name, grad in result['gradients'].items()}
+    assert set(gradients) == {name for name, _ in model.named_parameters()}
+    for name, param in model.named_parameters():
+        assert torch.allclose(gradients[name], param.grad, atol=1e-6), name
@@ -0,0 +1,53 @@
+import torch
+from vivid.nn.block.instance import Block
+from vivid.nn.block.prune import prune, l1_score
+from conftest import seeded
+
+
+def mlp():
+    cls = Block(name='MLP', fc1=torch.nn.Linear, act=torch.nn.ReLU, fc2=torch.nn.Linear)
+    return seeded(cls, fc1_in_features=4, fc1_out_features=8, fc2_in_features=8, fc2_out_features=3)
+
+
+def test_pruned_outputs_match_masked_original():
+    block = mlp()
+    pruned = prune(block, ratio=0.5)
+    assert pruned.fc1.out_features == pruned.fc2.in_features == 4
+    assert pruned.fc2.out_features == 3
+
+    masked = block.clone()
+    removed = l1_score(block.fc1).topk(4, largest=False).indices
+    with torch.no_grad():
+        masked.fc1.weight[removed] = 0.
+        masked.fc1.bias[removed] = 0.
+    inputs = torch.randn(5, 4)
+    assert torch.allclose(pruned(inputs), masked(inputs), atol=1e-6)
+
+
+def test_prune_leaves_the_original_untouched():
+    block = mlp()
+    weight = block.fc1.weight.clone()
+    pruned = prune(block, ratio=0.5)
+    assert block.fc1.out_features == 8 and torch.equal(block.fc1.weight, weight)
+    assert pruned.fc1.weight.data_ptr() != block.fc1.weight.data_ptr()
+
+
+def test_nested_blocks_are_copied():
+    inner = Block(name='Inner', fc1=torch.nn.Linear, act=torch.nn.ReLU, fc2=torch.nn.Linear)
+    outer = Block(name='Outer', inner=inner, head=torch.nn.Linear)
+    block = seeded(
+        outer, inner_fc1_in_features=4, inner_fc1_out_features=8, inner_fc2_in_features=8, inner_fc2_out_features=4,
+        head_in_features=4, head_out_features=2)
+    pruned = prune(block, ratio=0.5)
+    assert pruned is not block and block.inner.fc1.out_features == 8
+    assert pruned.inner.fc1.out_features == 4 and pruned.head.in_features == 4
+    assert pruned(torch.randn(3, 4)).shape == (3, 2)
+
+
+def test_width_changing_modules_are_barriers():
+    cls = Block(name='ConvNet', conv=torch.nn.Conv2d, flat=torch.nn.Flatten, fc=torch.nn.Linear)
+    block = cls(conv_in_channels=1, conv_out_channels=4, conv_kernel_size=3, fc_in_features=4 * 4 * 4,
+                fc_out_features=2)
+    pruned = prune(block, ratio=0.5)
+    assert pruned.conv.out_channels == 4 and pruned.fc.in_features == 64
+    assert pruned(torch.randn(2, 1, 6, 6)).shape == (2, 2)
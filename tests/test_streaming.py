@@ -0,0 +1,87 @@
+import collections
+import pytest
+import torch
+from vivid.nn.block.instance import Block
+from vivid.nn.block.streaming import StreamStatePool, map_state
+from conftest import seeded
+
+
+class RunningSum(torch.nn.Module):
+    """causal cumulative sum over the time dimension, with a per-stream running total as step cache"""
+
+    def __init__(self, features):
+        super(RunningSum, self).__init__()
+        self.features = features
+
+    def forward(self, inputs):
+        return inputs.cumsum(1)
+
+    def init_state(self, num_streams):
+        return dict(total=torch.zeros(num_streams, self.features))
+
+    def step(self, inputs, state, slots=None):
+        if slots is None:
+            state['total'] += inputs
+            return state['total'].clone()
+        state['total'][slots] += inputs
+        return state['total'][slots]
+
+
+def build():
+    cls = Block(
+        name='Stream', lin=torch.nn.Linear, cum=RunningSum, connection_kind='residual', repeat_count=4,
+        repeat_tied=2)
+    return seeded(cls, in_features=3, out_features=3, features=3)
+
+
+def test_step_matches_forward():
+    block = build()
+    sequence = torch.randn(2, 5, 3)
+    state = block.init_state(num_streams=2)
+    assert len(state['block-0']) == 2  # one cache per tied repetition
+    outputs = torch.stack([block.step(sequence[:, t], state) for t in range(5)], dim=1)
+    assert torch.allclose(outputs, block(sequence), atol=1e-5)
+
+
+def test_pool_steps_subsets_in_place():
+    block = build()
+    pool = StreamStatePool(block, capacity=4)
+    first, second = pool.acquire(), pool.acquire()
+    sequences = torch.randn(2, 3, 3)
+    total = pool.state['block-0'][0]['cum'][0]['total']
+
+    outputs = [[], []]
+    for t in range(3):
+        step_outputs = pool.step(sequences[:, t], [first, second])
+        outputs[0].append(step_outputs[0])
+        outputs[1].append(step_outputs[1])
+    # a single stream can be stepped on its own
+    extra = pool.step(sequences[1:, 0], [second])
+
+    # caches are updated in place
+    assert pool.state['block-0'][0]['cum'][0]['total'] is total
+    expected = block(sequences)
+    for i in range(2):
+        assert torch.allclose(torch.stack(outputs[i]), expected[i], atol=1e-5)
+    assert torch.allclose(extra[0], block(torch.cat([sequences[1], sequences[1, :1]])[None])[0, -1], atol=1e-5)
+
+    pool.release(first)
+    assert pool.acquire() == first
+    assert not total[first].any() and total[second].any()
+
+
+def test_release_checks_slots():
+    pool = StreamStatePool(build(), capacity=2)
+    slot = pool.acquire()
+    pool.release(slot)
+    for invalid in (slot, -1, 2):
+        with pytest.raises(AssertionError):
+            pool.release(invalid)
+    assert pool.acquire() != pool.acquire()
+
+
+def test_map_state_namedtuple():
+    Cache = collections.namedtuple('Cache', ['keys', 'values'])
+    state = dict(attention=Cache(torch.ones(2), torch.ones(3)))
+    result = map_state(state, lambda tensor: tensor * 2)
+    assert isinstance(result['attention'], Cache) and result['attention'].values.tolist() == [2., 2., 2.]
@@ -0,0 +1,71 @@
+import torch
+from vivid.nn.block.instance import Block
+from vivid.utilities.variables import Var
+
+
+def normalized(description):
+    # variables are compared by their representation (previous_block variables are created on every build)
+    return {key: repr(value) if key == 'variable' else value for key, value in description.items()}
+
+
+def tables(cls):
+    return (
+        {name: [normalized(description) for description in value] for name, value in cls._args_table.items()},
+        {name: {section: {arg: normalized(value) for arg, value in args.items()} if section in ('args', 'var_cls')
+                else args for section, args in sections.items()} for name, sections in cls._block_args_table.items()},
+        {name: normalized(description) for name, description in cls._translation_table.items()},
+    )
+
+
+def recomputed_tables(cls):
+    cls._args_table = cls.args_table()
+    cls._block_args_table = cls.block_args_table()
+    cls._translation_table = cls.translation_table()
+    return tables(cls)
+
+
+def diamond():
+    """Child embedded in Middle and Top, Middle embedded in Top"""
+    child = Block(name='Child', lin=torch.nn.Linear)
+    middle = Block(name='Middle', child=child, other=torch.nn.Linear)
+    top = Block(name='Top', middle=middle, child=child)
+    return child, middle, top
+
+
+def test_dependants_are_ordered_after_their_dependencies():
+    child, middle, top = diamond()
+    assert child._ordered_dependants() == [middle, top]
+    assert middle._ordered_dependants() == [top]
+    assert top._ordered_dependants() == []
+
+
+def test_parent_tables_are_refreshed():
+    child, middle, top = diamond()
+    child.update_defaults(dict(lin=dict(in_features=5)))
+    for cls in (child, middle, top):
+        assert any(
+            description['block'][-2:] == ('child', 'lin') or description['block'] == ('lin',)
+            for description in cls._args_table['in_features'] if description.get('default', None) == 5), cls
+    expected = [tables(cls) for cls in (child, middle, top)]
+    assert expected == [recomputed_tables(cls) for cls in (child, middle, top)]
+
+
+def test_only_affected_entries_are_recomputed(monkeypatch):
+    child, middle, top = diamond()
+    calls = []
+    original = top._block_args_entry.__func__
+
+    def record(cls, block_name, module_cls):
+        calls.append((cls.__name__, block_name))
+        return original(cls, block_name, module_cls)
+
+    for cls in (child, middle, top):
+        monkeypatch.setattr(cls, '_block_args_entry', classmethod(record))
+    child.update_defaults(dict(lin=dict(in_features=5)))
+    assert calls == [('Child', 'lin'), ('Middle', 'child'), ('Top', 'middle'), ('Top', 'child')]
+
+
+def test_classes_chosen_through_variables_are_dependants():
+    child = Block(name='Child', lin=torch.nn.Linear)
+    parent = Block(name='Parent', chosen=Var('chosen', default=child))
+    assert child._ordered_dependants() == [parent]
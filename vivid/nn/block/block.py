@@ -1,14 +1,27 @@
 import torch
 import typing as th
 import inspect
+import copy
+import itertools
+import sys
 from vivid.utilities import parse
 from .repr import _BlockRepr
-from vivid.utilities.variables import Var, var_args_description
+from vivid.utilities.variables import Var, ArgDescription, var_args_description
 
 from collections import OrderedDict, defaultdict
+import weakref
 
+# module class -> argument descriptions of its constructor (released along with the class)
+_parameters_descriptions_cache = weakref.WeakKeyDictionary()
 
-# from .instance import Block
+
+def _parameters_descriptions(module_cls):
+    """argument descriptions of a module class constructor (shared among all the blocks using the class)"""
+    if module_cls not in _parameters_descriptions_cache:
+        _parameters_descriptions_cache[module_cls] = tuple(
+            (sys.intern(name), ArgDescription.from_dict(description)) for name, description in
+            parse.function_parameters(module_cls).items())
+    return _parameters_descriptions_cache[module_cls]
 
 
 class _Block(metaclass=_BlockRepr):
@@ -37,17 +50,19 @@ class _Block(metaclass=_BlockRepr):
             else:
                 temp_kwargs[key] = value
         kwargs = temp_kwargs
+        # kept for rebuilding the block with modified arguments
+        self.build_kwargs = dict(
+            repeat=repeat, parallel=parallel, connection=connection, defaults=defaults, init=init, **kwargs)
 
         self.initialized = True
         self.block_names = []
-        self.connection = connection
 
         # initializing variables
         defaults = defaults or dict()
         defaults = {**defaults, **self._defaults}
 
         # connection details
-        connection = self.__get_connection_description(kwargs, connection)
+        connection = self.connection = self.__get_connection_description(kwargs, connection)
 
         # initialization details todo
 
@@ -81,9 +96,10 @@ class _Block(metaclass=_BlockRepr):
                 if arg_description['kind'] == 'VAR' and arg_description['variable'].is_active(
                         prefix=name, name=arg_name):
                     args[arg_name] = arg_description['variable'].value(name=arg_name, prefix=name)
-                else:
-                    args[arg_name] = related_kwargs[arg_name] if arg_name in related_kwargs else arg_description[
-                        'default']
+                elif arg_name in related_kwargs:
+                    args[arg_name] = related_kwargs[arg_name]
+                elif 'default' in arg_description:
+                    args[arg_name] = arg_description['default']
             if 'active' in related_kwargs:  # block activity (special argument) todo
                 del related_kwargs['active']
 
@@ -98,8 +114,10 @@ class _Block(metaclass=_BlockRepr):
 
             for arg_name, arg_value in related_kwargs.items():
                 if arg_name not in args:
-                    assert isinstance(
-                        item, Var) or 'var_keyword' in block_args, f'unknown argument is provided for block: {name}'
+                    # nested blocks resolve their own (prefixed) arguments
+                    assert isinstance(item, Var) or 'var_keyword' in block_args or (
+                            inspect.isclass(item_cls) and issubclass(item_cls, _Block)), \
+                        f'unknown argument is provided for block: {name}'
                     args[arg_name] = arg_value
             previous_block = item_cls(**args)
             setattr(self, name, previous_block)
@@ -114,47 +132,63 @@ class _Block(metaclass=_BlockRepr):
 
     @classmethod
     def args_table(cls):
+        cls._args_entries = OrderedDict(
+            (block_name, cls._block_args_entry(block_name, module_cls)) for block_name, module_cls in
+            cls._block.items())
+        return cls._assemble_args_table()
+
+    @classmethod
+    def _block_args_entry(cls, block_name, module_cls):
+        """arguments contributed by a single block as a list of (arg_name, description) pairs"""
+        defaults = cls._defaults
+        kwargs = dict()
+        if inspect.isclass(module_cls) and issubclass(module_cls, _Block):
+            block_args = module_cls._assemble_args_table()
+        elif inspect.isclass(module_cls) and issubclass(module_cls, torch.nn.Module):
+            block_args = OrderedDict(_parameters_descriptions(module_cls))
+            for arg, value in cls._args.get(block_name, dict()).items():
+                if isinstance(value, Var):
+                    block_args[arg] = var_args_description(
+                        value, block_name=block_name, arg_name=arg, defaults=defaults, kwargs=kwargs)
+                else:
+                    block_args[arg] = ArgDescription(kind='NORMAL', default=value)
+            # setting defaults
+            for arg, value in cls._defaults.get(block_name, dict()).items():
+                if block_args[arg].kind != 'VAR':
+                    block_args[arg] = block_args[arg].replace(default=value)
+        elif isinstance(module_cls, Var):
+            block_args = dict()
+            description = var_args_description(
+                module_cls, block_name=block_name, arg_name=block_name, defaults=defaults, kwargs=kwargs).replace(
+                var_cls=True)
+            for name in description['lookup']:
+                block_args[name] = description
+        else:
+            block_args = dict()
+
+        entry = []
+        for arg, description in block_args.items():
+            if isinstance(description, (list, tuple)):
+                for des in description:
+                    des = des.prefixed(block_name)
+                    if des.kind == 'VAR':
+                        kw_context = (des.variable.context == 'kwargs') if not des.variable.priority_lookup else (
+                            'kwargs' in des.variable._contexts)
+                        if kw_context and not des.lookup:
+                            continue
+                    entry.append((arg, des))
+                continue
+            entry.append((arg, description.prefixed(block_name)))
+        return entry
+
+    @classmethod
+    def _assemble_args_table(cls):
+        """builds the args table out of the cached block entries (descriptions are shared with the entries)"""
         args_table = defaultdict(list)
         defaults = cls._defaults
         kwargs = dict()
-        for block_name, module_cls in cls._block.items():
-            if inspect.isclass(module_cls) and issubclass(module_cls, _Block):
-                block_args = module_cls.args_table()
-            elif inspect.isclass(module_cls) and issubclass(module_cls, torch.nn.Module):
-                block_args = parse.function_parameters(module_cls)
-                for arg, value in cls._args.get(block_name, dict()).items():
-                    if isinstance(value, Var):
-                        block_args[arg] = var_args_description(
-                            value, block_name=block_name, arg_name=arg, defaults=defaults, kwargs=kwargs)
-                    else:
-                        block_args[arg] = dict(kind='NORMAL', default=value)
-                # setting defaults
-                for arg, value in cls._defaults.get(block_name, dict()).items():
-                    if block_args[arg]['kind'] != 'VAR':
-                        block_args[arg]['default'] = value
-            elif isinstance(module_cls, Var):
-                block_args = dict()
-                description = var_args_description(
-                    module_cls, block_name=block_name, arg_name=block_name, defaults=defaults, kwargs=kwargs)
-                description['VAR_CLS'] = True
-                for name in description['lookup']:
-                    block_args[name] = description
-            else:
-                block_args = dict()
-
-            for arg, description in block_args.items():
-                if isinstance(description, (list, tuple)):
-                    for des in description:
-                        des['block'] = [block_name] + des['block']
-                        if des['kind'] == 'VAR':
-                            kw_context = (des['variable'].context == 'kwargs') if not des[
-                                'variable'].priority_lookup else ('kwargs' in des['variable']._contexts)
-                            if kw_context and not des['lookup']:
-                                continue
-                        args_table[arg].append(des)
-                    continue
-                description['block'] = [block_name] if 'block' not in description else [block_name] + description[
-                    'block']
+        for entry in cls._args_entries.values():
+            for arg, description in entry:
                 args_table[arg].append(description)
 
         for arg_name, value in cls._args.get('args', dict()).items():
@@ -163,9 +197,9 @@ class _Block(metaclass=_BlockRepr):
                 description = var_args_description(
                     value, block_name=args_table[arg_name][0]['block'], arg_name=arg_name, defaults=defaults,
                     kwargs=kwargs)
-                args_table[arg_name][0] = {**args_table[arg_name][0], **description}
-        args_table['previous_block'].append(var_args_description(Var('previous_block', active='exists')))
-        args_table['previous_block'][-1]['block'] = []
+                args_table[arg_name][0] = args_table[arg_name][0].merge(description)
+        args_table['previous_block'].append(
+            var_args_description(Var('previous_block', active='exists')).replace(block=()))
         return args_table
 
     @classmethod
@@ -203,17 +237,24 @@ class _Block(metaclass=_BlockRepr):
                 else:
                     table[arg_name].append(arg)
         table = {name: value[0] for name, value in table.items() if len(value) == 1}
-        # setting up default values
+        # setting up default values (descriptions are immutable and are replaced in every table referring to them)
         for name, value in cls._defaults.items():
             assert not isinstance(value, Var), 'default values cannot be variables'
-            if name in table and table[name]['kind'] != 'VAR':
-                table[name]['default'] = value
-                block_name = table[name]['block'][0]
-                if name in cls._block_args_table[block_name].get('args', dict()):
-                    cls._block_args_table[block_name]['args'][name]['default'] = value
-                if name in cls._block_args_table[block_name].get('var_cls', dict()):
-                    cls._block_args_table[block_name]['var_cls'][name]['default'] = value
-                cls._args_table[name][0]['default'] = value
+            if name in table and table[name].kind != 'VAR':
+                replaced = dict()
+
+                def with_default(description):
+                    if id(description) not in replaced:
+                        replaced[id(description)] = description.replace(default=value)
+                    return replaced[id(description)]
+
+                block_name = table[name].block[0]
+                table[name] = with_default(table[name])
+                for section in ('args', 'var_cls'):
+                    if name in cls._block_args_table[block_name].get(section, dict()):
+                        cls._block_args_table[block_name][section][name] = with_default(
+                            cls._block_args_table[block_name][section][name])
+                cls._args_table[name][0] = with_default(cls._args_table[name][0])
         return table
 
     # descriptions
@@ -268,6 +309,8 @@ class _Block(metaclass=_BlockRepr):
 
     # instantiation
     def __instantiate_repeat(self, kwargs, defaults, init):
+        from .instance import Block
+
         self.repeat['tied'] = self.repeat.get('tied', False)
         self.repeat['tied'] = 1 if self.repeat['tied'] is False else (
             self.repeat['count'] if self.repeat['tied'] is True else self.repeat['tied'])
@@ -282,20 +325,142 @@ class _Block(metaclass=_BlockRepr):
             repeat=None,
             connection=self.repeat['connection'],
             init=init,
-            # blocks
-            block=self._block,
             # args & defaults
-            defaults=self._defaults,
-            args=self._args,
+            defaults=dict(self._defaults),
+            args=self._args.get('args', None),
+            # blocks
+            **{f'{name}_args': value for name, value in self._args.items() if name != 'args'},
+            **self._block,
         )
+        # number of times each slot is applied (slots are reused for tied repetitions)
+        self.repeat['repetitions'] = [
+            min(self.repeat['tied'], self.repeat['count'] - i * self.repeat['tied']) for i in
+            range(self.repeat['num_blocks'])]
 
         for i in range(self.repeat['num_blocks']):
-            blocks_left = self.repeat['count'] - i * self.repeat['tied']
             block = template(init=init, defaults=defaults, **kwargs)
-            name = f'block-{i}' if self.repeat['tied'] == 1 else \
-                f'block-{i}-[{self.repeat["tied"] if blocks_left >= self.repeat["tied"] else blocks_left}]'
             setattr(self, f'block-{i}', block)
 
+        # exit heads (arguments are provided as repeat_exit_[arg])
+        if self.repeat.get('exit', None):
+            exit_args = parse.args_dict('exit', self.repeat)
+            for i in range(self.repeat['num_blocks']):
+                setattr(self, f'exit-{i}', self.repeat['exit'](**exit_args))
+
+    def clone(self, share_parameters=False, reset_parameters=False):
+        """
+        new instance with the same structure as this (built) block, without re-running the declarative build.
+
+        :param share_parameters: whether the clone shares the parameters & buffers of this block (call share_memory
+            on the block beforehand to share them across processes)
+        :param reset_parameters: whether to re-initialize the copied parameters of the sub-modules providing
+            reset_parameters (ignored when sharing parameters), the other sub-modules keep copies of the weights
+        """
+        memo = dict()
+        if share_parameters:
+            for tensor in itertools.chain(self.parameters(), self.buffers()):
+                memo[id(tensor)] = tensor
+        clone = copy.deepcopy(self, memo)
+        if reset_parameters and not share_parameters:
+            for module in clone.modules():
+                if callable(getattr(module, 'reset_parameters', None)):
+                    module.reset_parameters()
+        return clone
+
+    def early_exit(self, inputs, halting=None):
+        """
+        adaptive-depth inference over the repeat slots, samples leave the batch as soon as the halting criterion is
+        met on the output of their current exit head. Exit heads are applied on the slot outputs connected to the block
+        inputs (the block connection), so that the last exit head sees the outputs of the block.
+
+        :param inputs: batch of inputs to the first repeat slot
+        :param halting: confidence threshold (over the softmax of the exit head outputs) or a callable mapping exit
+            head outputs to a boolean mask of halted samples, defaults to the repeat_halting of the block
+        :return: exit head outputs and the number of evaluated repeat slots for each sample
+        """
+        assert self.repeat['count'] and self.repeat.get('exit', None), 'early exit requires repeat exit heads'
+        halting = halting if halting is not None else self.repeat.get('halting', None)
+        if halting is not None and not callable(halting):
+            threshold = halting
+            halting = lambda outputs: outputs.softmax(-1).max(-1)[0] >= threshold
+
+        num_blocks = self.repeat['num_blocks']
+        indices = torch.arange(inputs.shape[0], device=inputs.device)
+        depths = torch.zeros(inputs.shape[0], dtype=torch.long, device=inputs.device)
+        results, block_inputs = None, inputs
+        for i, (name, repetitions) in enumerate(self._execution_plan()):
+            for _ in range(repetitions):
+                inputs = getattr(self, name)(inputs)
+            is_last = i == num_blocks - 1
+            if halting is None and not is_last:
+                continue
+            outputs = getattr(self, f'exit-{i}')(self._connect(block_inputs, inputs))
+            if results is None:
+                results = outputs.new_empty((depths.shape[0],) + outputs.shape[1:])
+            halted = torch.ones_like(indices, dtype=torch.bool) if is_last else halting(outputs)
+            results[indices[halted]] = outputs[halted]
+            depths[indices[halted]] = i + 1
+            # compacting the batch
+            indices, inputs, block_inputs = indices[~halted], inputs[~halted], block_inputs[~halted]
+            if not indices.shape[0]:
+                break
+        return results, depths
+
+    # execution
+    def _execution_plan(self):
+        """sub-block names in execution order along with the number of times each of them is applied"""
+        if self.repeat['count']:
+            return [(f'block-{i}', repetitions) for i, repetitions in enumerate(self.repeat['repetitions'])]
+        return [(name, 1) for name in self.block_names]
+
+    def forward(self, inputs):
+        outputs = inputs
+        for name, repetitions in self._execution_plan():
+            for _ in range(repetitions):
+                outputs = getattr(self, name)(outputs)
+        return self._connect(inputs, outputs)
+
+    # incremental inference
+    def init_state(self, num_streams=1):
+        """
+        preallocated per-stream caches of the sub-blocks supporting incremental inference (one cache per repetition
+        of tied repeat slots)
+        """
+        return {
+            name: [getattr(self, name).init_state(num_streams) for _ in range(repetitions)] for name, repetitions in
+            self._execution_plan() if hasattr(getattr(self, name), 'init_state')
+        }
+
+    def step(self, inputs, state, slots=None):
+        """
+        incremental inference of a single timestep, stateful sub-blocks (the ones providing init_state & step) update
+        the rows of their caches in place, while the other sub-blocks are applied on the timestep inputs directly.
+
+        :param inputs: inputs of the current timestep, one row per stepped stream
+        :param state: caches of the streams as created by init_state
+        :param slots: indices of the stepped streams in the caches (all of them if not provided)
+        :return: outputs of the current timestep
+        """
+        outputs = inputs
+        for name, repetitions in self._execution_plan():
+            block = getattr(self, name)
+            for repetition in range(repetitions):
+                outputs = block.step(outputs, state[name][repetition], slots=slots) if name in state else block(
+                    outputs)
+        return self._connect(inputs, outputs)
+
+    def _connect(self, inputs, outputs):
+        kind = self.connection.get('kind', None) or 'normal'
+        if kind == 'normal':
+            return outputs
+        if callable(self.connection.get('reduction', None)):
+            return self.connection['reduction'](inputs, outputs)
+        if kind == 'residual':
+            return inputs + outputs
+        if kind == 'dense':
+            return torch.cat([inputs, outputs], dim=-1)
+        return outputs
+
     def initialize_weights(self, context_level=1):
         pass
 
@@ -307,12 +472,67 @@ class _Block(metaclass=_BlockRepr):
 
     @classmethod
     def update_defaults(cls, defaults):
+        """
+        update the default values of the block and incrementally refresh the tables of this class and every
+        generated Block class that (transitively) embeds it.
+
+        Only the block entries that can be affected by the new defaults are recomputed (i.e. the constructor
+        inspection, variable evaluation and nested tables of a block entry), while the flat args, block args and
+        translation tables of each refreshed class are rebuilt from the cached entries in a linear pass.
+        """
         cls._defaults = {**cls._defaults, **defaults}
-        cls._args_table = cls.args_table()
-        cls._translation_table = cls.translation_table()
-        cls._block_args_table = cls.block_args_table()
+        cls._refresh_tables(cls._defaults_dependent_entries(defaults))
+
+        changed = {cls}
+        for dependant in cls._ordered_dependants():
+            dependant._refresh_tables([
+                name for name, item in dependant._block.items() if
+                any(block_cls in changed for block_cls in _Block._embedded_classes(item))])
+            changed.add(dependant)
         return cls
 
-    def _forward(self, inputs):
-        if self.repeat['count']:
-            pass
+    @staticmethod
+    def _embedded_classes(item):
+        """Block classes a block entry depends on (the class itself or the default class of a variable)"""
+        if isinstance(item, Var):
+            item = item.default if item.default_set else None
+        return [item] if inspect.isclass(item) and issubclass(item, _Block) else []
+
+    @classmethod
+    def _defaults_dependent_entries(cls, defaults):
+        """names of the block entries whose arguments might depend on the provided default values"""
+        names = OrderedDict()
+        for key in defaults:
+            if key in cls._block:
+                names[key] = True
+                continue
+            # top level defaults are only visible through variable lookups
+            for block_name, item in cls._block.items():
+                if isinstance(item, Var) or any(
+                        isinstance(value, Var) for value in cls._args.get(block_name, dict()).values()):
+                    names[block_name] = True
+        return list(names)
+
+    @classmethod
+    def _ordered_dependants(cls):
+        """transitive dependants of the class, each one placed after all of its own dependencies"""
+        visited, order = set(), []
+
+        def visit(block_cls):
+            for dependant in list(block_cls._dependants):
+                if dependant not in visited:
+                    visited.add(dependant)
+                    visit(dependant)
+                    order.append(dependant)
+
+        visit(cls)
+        return order[::-1]
+
+    @classmethod
+    def _refresh_tables(cls, block_names):
+        """recomputes the given block entries and rebuilds the flat tables out of the cached entries"""
+        for block_name in block_names:
+            cls._args_entries[block_name] = cls._block_args_entry(block_name, cls._block[block_name])
+        cls._args_table = cls._assemble_args_table()
+        cls._block_args_table = cls.block_args_table()
+        cls._translation_table = cls.translation_table()
@@ -0,0 +1,197 @@
+import typing as th
+import torch
+import torch.distributed as dist
+from collections import OrderedDict
+from .block import _Block
+
+
+def block_units(module: torch.nn.Module, prefix: str = ''):
+    """
+    sharding units of a block instance in execution order, as (name, module) pairs.
+
+    Nested blocks are expanded into their own units, while repeat slots and plain torch modules are kept as single
+    units.
+    """
+    if not isinstance(module, _Block):
+        return [(prefix, module)]
+    units = []
+    for name, _ in module._execution_plan():
+        child = getattr(module, name)
+        child_prefix = f'{prefix}.{name}' if prefix else name
+        if module.repeat['count']:
+            units.append((child_prefix, child))
+        else:
+            units += block_units(child, prefix=child_prefix)
+    return units
+
+
+def units_parameters(module: torch.nn.Module, units: th.List[th.Tuple[str, torch.nn.Module]]):
+    """trainable parameters of each unit, tied parameters are only assigned to the first unit using them"""
+    seen = set()
+    result = OrderedDict()
+    for name, unit in units + [('', module)]:
+        params = []
+        for param in unit.parameters():
+            if param.requires_grad and id(param) not in seen:
+                seen.add(id(param))
+                params.append(param)
+        if params:
+            result[name] = params
+    return result
+
+
+def gradient_buckets(unit_params: th.Dict[str, th.List[torch.nn.Parameter]], bucket_cap_mb: float = 25.):
+    """groups parameters into buckets aligned on unit boundaries, in reverse execution order"""
+    bucket_cap = bucket_cap_mb * 1024 * 1024
+    buckets, bucket, size = [], [], 0
+    for name in reversed(unit_params):
+        for param in reversed(unit_params[name]):
+            bucket.append(param)
+            size += param.numel() * param.element_size()
+        if size >= bucket_cap:
+            buckets.append(bucket)
+            bucket, size = [], 0
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def shard_units(unit_params: th.Dict[str, th.List[torch.nn.Parameter]], world_size: int):
+    """
+    assigns contiguous ranges of units to ranks while balancing the number of parameters of each rank (used for
+    sharding the optimizer states, tied parameters belong to a single unit and are thus owned by a single rank)
+    """
+    total = sum(param.numel() for params in unit_params.values() for param in params)
+    shards = [[] for _ in range(world_size)]
+    rank, assigned = 0, 0
+    for name, params in unit_params.items():
+        numel = sum(param.numel() for param in params)
+        if shards[rank] and assigned + numel / 2 > total * (rank + 1) / world_size and rank < world_size - 1:
+            rank += 1
+        shards[rank].append(name)
+        assigned += numel
+    return shards
+
+
+class BlockDataParallel(torch.nn.Module):
+    def __init__(
+            self,
+            module: torch.nn.Module,
+            process_group: th.Optional[th.Any] = None,
+            bucket_cap_mb: float = 25.,
+            broadcast_parameters: bool = True,
+            broadcast_buffers: bool = True,
+    ):
+        """
+        data parallel wrapper using the block hierarchy to choose gradient buckets and optimizer state shards.
+
+        Like DistributedDataParallel, gradients are averaged over all ranks with asynchronous all-reduces, here on
+        buckets aligned on the block units (repeat slots / sub-blocks) and laid out in reverse execution order. Tied
+        parameters are only part of one bucket, so they are communicated once. Bucket reductions are always started
+        in the same (bucket index) order on every rank, even when some parameters are left unused on some of them.
+        Units are also partitioned among the ranks (see local_parameters) for sharding the optimizer states; the
+        parameters themselves are replicated on every rank.
+
+        :param module: block instance to wrap
+        :param process_group: process group used for communication (default group if not provided)
+        :param bucket_cap_mb: approximate size of each gradient bucket, buckets are only closed at unit boundaries
+        :param broadcast_parameters: whether to broadcast the parameters and buffers of rank 0 to all other ranks
+        :param broadcast_buffers: whether to broadcast the buffers of rank 0 (e.g. batch-norm running statistics) to
+            all other ranks before each training forward pass
+        """
+        super(BlockDataParallel, self).__init__()
+        self.module = module
+        self.process_group = process_group
+        self.world_size = dist.get_world_size(process_group)
+        self.rank = dist.get_rank(process_group)
+        self.broadcast_buffers = broadcast_buffers
+
+        self.units = block_units(module)
+        self.unit_parameters = units_parameters(module, self.units)
+        self.buckets = gradient_buckets(self.unit_parameters, bucket_cap_mb=bucket_cap_mb)
+        self.shards = shard_units(self.unit_parameters, self.world_size)
+
+        if broadcast_parameters:
+            for params in self.unit_parameters.values():
+                for param in params:
+                    dist.broadcast(param.data, src=self.__global_rank(0), group=process_group)
+            self.__broadcast_buffers()
+
+        self.__bucket_of = dict()
+        for index, bucket in enumerate(self.buckets):
+            for param in bucket:
+                self.__bucket_of[id(param)] = index
+                param.register_post_accumulate_grad_hook(self.__gradient_ready)
+        self.__reset()
+
+    def forward(self, *args, **kwargs):
+        if self.broadcast_buffers and self.training:
+            self.__broadcast_buffers()
+        return self.module(*args, **kwargs)
+
+    def local_parameters(self):
+        """
+        parameters of the units owned by the current rank, an optimizer built on these (followed by broadcasting the
+        updated parameters from their owners, see broadcast_shards) only keeps the states of this rank's shard
+        """
+        return [param for name in self.shards[self.rank] for param in self.unit_parameters[name]]
+
+    @torch.no_grad()
+    def broadcast_shards(self):
+        """sends the parameters of each shard from its owner to the other ranks (after a sharded optimizer step)"""
+        works = []
+        for rank, names in enumerate(self.shards):
+            for name in names:
+                for param in self.unit_parameters[name]:
+                    works.append(dist.broadcast(
+                        param.data, src=self.__global_rank(rank), group=self.process_group, async_op=True))
+        for work in works:
+            work.wait()
+
+    def __global_rank(self, rank):
+        return dist.get_global_rank(self.process_group, rank) if self.process_group is not None else rank
+
+    @torch.no_grad()
+    def __broadcast_buffers(self):
+        for buffer in self.module.buffers():
+            dist.broadcast(buffer, src=self.__global_rank(0), group=self.process_group)
+
+    def __reset(self):
+        self.__pending = [len(bucket) for bucket in self.buckets]
+        self.__works = [None] * len(self.buckets)
+        # buckets are reduced strictly in index order, so that collectives are issued in the same order by all ranks
+        self.__next_bucket = 0
+        self.__callback_queued = False
+
+    def __reduce_bucket(self, index):
+        grads = [
+            param.grad if param.grad is not None else torch.zeros_like(param) for param in self.buckets[index]]
+        flat = torch.cat([grad.reshape(-1) for grad in grads])
+        self.__works[index] = (dist.all_reduce(flat, group=self.process_group, async_op=True), flat)
+
+    def __gradient_ready(self, param):
+        if not self.__callback_queued:
+            torch.autograd.Variable._execution_engine.queue_callback(self.__finalize)
+            self.__callback_queued = True
+        self.__pending[self.__bucket_of[id(param)]] -= 1
+        while self.__next_bucket < len(self.buckets) and not self.__pending[self.__next_bucket]:
+            self.__reduce_bucket(self.__next_bucket)
+            self.__next_bucket += 1
+
+    def __finalize(self):
+        # the remaining buckets (waiting for unused parameters or for a previous bucket) are reduced in order
+        for index in range(self.__next_bucket, len(self.buckets)):
+            self.__reduce_bucket(index)
+        for bucket, (work, flat) in zip(self.buckets, self.__works):
+            work.wait()
+            flat.div_(self.world_size)
+            offset = 0
+            for param in bucket:
+                numel = param.numel()
+                grad = flat[offset:offset + numel].view_as(param)
+                if param.grad is None:
+                    param.grad = grad.clone()
+                else:
+                    param.grad.copy_(grad)
+                offset += numel
+        self.__reset()
@@ -2,6 +2,7 @@ import typing as th
 from vivid.utilities.variables import Var, var_args_description
 from .block import _Block
 import torch
+import weakref
 from collections import OrderedDict
 from vivid.utilities import parse
 
@@ -38,6 +39,8 @@ def Block(
         repeat_count: th.Optional[th.Union[bool, int, Var]] = None,
         repeat_tied: th.Optional[th.Union[bool, int, Var]] = None,
         repeat_connection: th.Optional[CONNECTION_KINDS] = None,
+        repeat_exit: th.Optional[th.Callable[..., torch.nn.Module]] = None,
+        repeat_halting: th.Optional[th.Union[float, th.Callable[[torch.Tensor], torch.Tensor]]] = None,
 
         # parallel
         parallel: th.Optional[th.Union[dict, bool]] = None,
@@ -74,6 +77,8 @@ def Block(
         repeat['tied'] = repeat_tied if repeat_tied is not None else repeat.get('tied', False)
         repeat['connection'] = repeat_connection if repeat_connection is not None else repeat.get(
             'connection', None)
+        repeat['exit'] = repeat_exit if repeat_exit is not None else repeat.get('exit', None)
+        repeat['halting'] = repeat_halting if repeat_halting is not None else repeat.get('halting', None)
     else:
         assert (repeat_count is not None or repeat_tied is not None or
                 repeat_connection is not None), 'inconsistent values are provided for "repeat"'
@@ -97,9 +102,15 @@ def Block(
             '_repeat': repeat,
             '_inputs': inputs,
             '_outputs': outputs,
+            '_dependants': weakref.WeakSet(),
         }
     )
     cls._args_table = cls.args_table()
     cls._block_args_table = cls.block_args_table()
     cls._translation_table = cls.translation_table()
+
+    # registering the class as a dependant of its nested blocks (used for incremental defaults update)
+    for item in blocks_dict.values():
+        for block_cls in _Block._embedded_classes(item):
+            block_cls._dependants.add(cls)
     return cls
@@ -0,0 +1,225 @@
+import typing as th
+import itertools
+import torch
+import torch.distributed as dist
+from .block import _Block
+
+try:
+    # Literal is available in python > 3.8
+    SCHEDULES = th.Literal["gpipe", "1f1b"]
+except AttributeError:
+    SCHEDULES = str
+
+MAX_DIMS = 8
+DTYPES = [torch.float32, torch.float64, torch.float16, torch.bfloat16, torch.int64, torch.int32, torch.bool]
+
+
+def pipeline_units(block: _Block):
+    """top-level units of a block instance in execution order: its repeat slots or its sub-blocks"""
+    return [(name, getattr(block, name)) for name, _ in block._execution_plan()]
+
+
+def parameters_cost(module: torch.nn.Module):
+    return sum(param.numel() for param in module.parameters()) + 1
+
+
+def partition_units(costs: th.List[float], num_stages: int):
+    """splits the units into contiguous stages minimizing the cost of the most expensive stage"""
+    count = len(costs)
+    assert 0 < num_stages <= count, 'number of stages should be between one and the number of units'
+    prefix = [0.]
+    for cost in costs:
+        prefix.append(prefix[-1] + cost)
+    # best[k][i]: minimal max-stage cost for the first i units split into k stages
+    best = [[float('inf')] * (count + 1) for _ in range(num_stages + 1)]
+    split = [[0] * (count + 1) for _ in range(num_stages + 1)]
+    best[0][0] = 0.
+    for k in range(1, num_stages + 1):
+        for i in range(k, count + 1):
+            for j in range(k - 1, i):
+                value = max(best[k - 1][j], prefix[i] - prefix[j])
+                if value < best[k][i]:
+                    best[k][i], split[k][i] = value, j
+    bounds, i = [], count
+    for k in range(num_stages, 0, -1):
+        bounds.append((split[k][i], i))
+        i = split[k][i]
+    return bounds[::-1]
+
+
+class PipelineStage(torch.nn.Module):
+    def __init__(
+            self,
+            block: _Block,
+            num_stages: th.Optional[int] = None,
+            cost: th.Optional[th.Callable[[torch.nn.Module], float]] = None,
+            process_group: th.Optional[th.Any] = None,
+            device: th.Optional[th.Union[str, torch.device]] = None,
+    ):
+        """
+        a single stage of a block split into a pipeline, each process of the group holds one stage.
+
+        Repeat slots are executed once per tied repetition within their stage. The block connection (residual, dense
+        or reduction) is applied by the last stage, to which the first stage sends the block inputs. Blocks built on
+        the meta device (see from_block) only get the units of this stage materialized.
+
+        :param block: block instance whose repeat slots / sub-blocks are partitioned into stages
+        :param num_stages: number of stages (should be the size of the process group)
+        :param cost: function estimating the cost of a unit (defaults to its number of parameters)
+        :param process_group: process group of the pipeline, the rank in the group is the stage index
+        :param device: device on which the units of a meta block are materialized (cpu by default)
+        """
+        super(PipelineStage, self).__init__()
+        self.process_group = process_group
+        self.stage = dist.get_rank(process_group)
+        self.num_stages = num_stages or dist.get_world_size(process_group)
+        assert self.num_stages == dist.get_world_size(process_group), \
+            'number of stages should match the size of the process group'
+        units = pipeline_units(block)
+        self.bounds = partition_units([(cost or parameters_cost)(module) for _, module in units], self.num_stages)
+        start, end = self.bounds[self.stage]
+        plan = block._execution_plan()[start:end]
+        self.unit_names = [name for name, _ in plan]
+        self.repetitions = [repetitions for _, repetitions in plan]
+        self.units = torch.nn.ModuleList([module for _, module in units[start:end]])
+        self.connect = block._connect if (block.connection.get('kind', None) or 'normal') != 'normal' else None
+        for unit in self.units:
+            if any(tensor.is_meta for tensor in itertools.chain(unit.parameters(), unit.buffers())):
+                unit.to_empty(device=device or 'cpu')
+                for module in unit.modules():
+                    if callable(getattr(module, 'reset_parameters', None)):
+                        module.reset_parameters()
+
+    @classmethod
+    def from_block(
+            cls,
+            block_cls: th.Type[_Block],
+            num_stages: th.Optional[int] = None,
+            cost: th.Optional[th.Callable[[torch.nn.Module], float]] = None,
+            process_group: th.Optional[th.Any] = None,
+            device: th.Optional[th.Union[str, torch.device]] = None,
+            **kwargs
+    ):
+        """
+        builds the block on the meta device and only materializes the units of this stage, so that no process has to
+        hold the whole block in memory. Parameters are initialized with reset_parameters (the sub-modules without it
+        are left uninitialized and should be loaded from a checkpoint).
+        """
+        with torch.device('meta'):
+            block = block_cls(**kwargs)
+        return cls(block, num_stages=num_stages, cost=cost, process_group=process_group, device=device)
+
+    @property
+    def is_first(self):
+        return self.stage == 0
+
+    @property
+    def is_last(self):
+        return self.stage == self.num_stages - 1
+
+    def forward(self, inputs):
+        """applies the units of this stage (without the block connection)"""
+        for unit, repetitions in zip(self.units, self.repetitions):
+            for _ in range(repetitions):
+                inputs = unit(inputs)
+        return inputs
+
+    def train_step(
+            self,
+            inputs: th.Optional[torch.Tensor] = None,
+            targets: th.Optional[torch.Tensor] = None,
+            loss_function: th.Optional[th.Callable] = None,
+            num_micro_batches: int = 1,
+            schedule: SCHEDULES = '1f1b',
+    ):
+        """
+        runs the forward and backward passes of a batch split into micro-batches, gradients are accumulated in the
+        stage parameters.
+
+        :param inputs: batch inputs (only used by the first stage)
+        :param targets: batch targets (only used by the last stage)
+        :param loss_function: called with the outputs and targets of each micro-batch (only used by the last stage)
+        :param num_micro_batches: number of micro-batches to split the batch into (the batch size should be at least
+            the number of micro-batches, micro-batch losses are weighted by their size)
+        :param schedule: "gpipe" (all forwards then all backwards) or "1f1b" (interleaved forwards and backwards)
+        :return: the loss of the batch on the last stage and None elsewhere
+        """
+        assert schedule in ('gpipe', '1f1b'), f'unknown schedule "{schedule}"'
+        for batch in (inputs if self.is_first else None, targets if self.is_last else None):
+            assert batch is None or batch.shape[0] >= num_micro_batches, 'batch is smaller than the micro-batches'
+        # tensor_split always returns the requested number of micro-batches (chunk might return less)
+        inputs = inputs.tensor_split(num_micro_batches) if self.is_first else [None] * num_micro_batches
+        targets = targets.tensor_split(num_micro_batches) if self.is_last else [None] * num_micro_batches
+        batch_size = sum(target.shape[0] for target in targets) if self.is_last else None
+        self.__saved, self.__sends, self.__loss = [], [], 0.
+
+        warmup = num_micro_batches if schedule == 'gpipe' else min(
+            self.num_stages - self.stage - 1, num_micro_batches)
+        for i in range(warmup):
+            self.__forward_step(inputs[i], targets[i], loss_function, batch_size)
+        for i in range(warmup, num_micro_batches):
+            self.__forward_step(inputs[i], targets[i], loss_function, batch_size)
+            self.__backward_step()
+        while self.__saved:
+            self.__backward_step()
+
+        for work, _ in self.__sends:
+            work.wait()
+        self.__sends = []
+        return self.__loss if self.is_last else None
+
+    # steps
+    def __forward_step(self, inputs, targets, loss_function, batch_size):
+        block_inputs = inputs
+        if self.connect is not None and self.num_stages > 1:
+            # block inputs are sent before the stage outputs, so that a two stage pipeline receives them in order
+            if self.is_first:
+                self.__send(inputs, self.num_stages - 1)
+            elif self.is_last:
+                block_inputs = self.__recv(0)
+        if not self.is_first:
+            inputs = self.__recv(self.stage - 1)
+            if inputs.is_floating_point():
+                inputs.requires_grad_()
+        outputs = self(inputs)
+        if self.is_last:
+            if self.connect is not None:
+                outputs = self.connect(block_inputs, outputs)
+            outputs = loss_function(outputs, targets) * (targets.shape[0] / batch_size)
+            self.__loss += outputs.item()
+        else:
+            self.__send(outputs.detach(), self.stage + 1)
+        self.__saved.append((inputs, outputs))
+
+    def __backward_step(self):
+        inputs, outputs = self.__saved.pop(0)
+        if self.is_last:
+            outputs.backward()
+        else:
+            torch.autograd.backward(outputs, self.__recv(self.stage + 1))
+        if not self.is_first:
+            self.__send(inputs.grad if inputs.grad is not None else torch.zeros_like(inputs), self.stage - 1)
+
+    # communication
+    def __global_rank(self, stage):
+        return dist.get_global_rank(self.process_group, stage) if self.process_group is not None else stage
+
+    def __send(self, tensor, stage):
+        assert tensor.dim() <= MAX_DIMS, f'stage outputs can have at most {MAX_DIMS} dimensions'
+        header = torch.zeros(MAX_DIMS + 2, dtype=torch.int64)
+        header[0], header[1] = tensor.dim(), DTYPES.index(tensor.dtype)
+        header[2:2 + tensor.dim()] = torch.tensor(tensor.shape, dtype=torch.int64)
+        tensor = tensor.contiguous()
+        dst = self.__global_rank(stage)
+        # tensors are kept alive until their sends are completed
+        self.__sends.append((dist.isend(header, dst=dst, group=self.process_group), header))
+        self.__sends.append((dist.isend(tensor, dst=dst, group=self.process_group), tensor))
+
+    def __recv(self, stage):
+        src = self.__global_rank(stage)
+        header = torch.zeros(MAX_DIMS + 2, dtype=torch.int64)
+        dist.recv(header, src=src, group=self.process_group)
+        shape = header[2:2 + header[0].item()].tolist()
+        tensor = torch.empty(shape, dtype=DTYPES[header[1].item()])
+        dist.recv(tensor, src=src, group=self.process_group)
+        return tensor
@@ -0,0 +1,116 @@
+import typing as th
+import torch
+from .block import _Block
+
+# (input width, output width) argument names of the prunable modules
+WIDTH_ARGS = [('in_features', 'out_features'), ('in_channels', 'out_channels')]
+# modules acting on each unit independently, which can sit between a pruned module and its consumer
+ELEMENTWISE = (
+    torch.nn.ReLU, torch.nn.ReLU6, torch.nn.LeakyReLU, torch.nn.ELU, torch.nn.GELU, torch.nn.SiLU, torch.nn.Tanh,
+    torch.nn.Sigmoid, torch.nn.Identity, torch.nn.Dropout, torch.nn.Dropout2d)
+
+
+def width_args(block: _Block, name: str):
+    """width arguments of a sub-block according to the block args table (None if it cannot be pruned)"""
+    module = getattr(block, name)
+    if isinstance(module, _Block):
+        return None  # nested blocks are pruned on their own
+    args = block._block_args_table.get(name, dict()).get('args', dict())
+    for in_arg, out_arg in WIDTH_ARGS:
+        if in_arg in args and out_arg in args and hasattr(module, in_arg) and hasattr(module, out_arg):
+            # only plain (non grouped / non transposed) layouts of [out, in, ...] weights are supported
+            if getattr(module, 'groups', 1) == 1 and not getattr(module, 'transposed', False):
+                return in_arg, out_arg
+    return None
+
+
+def is_norm(module: torch.nn.Module):
+    return isinstance(module, torch.nn.modules.batchnorm._BatchNorm)
+
+
+def l1_score(module: torch.nn.Module):
+    return module.weight.detach().abs().flatten(1).sum(1)
+
+
+def _slice_state(module: torch.nn.Module, kept_outputs=None, kept_inputs=None):
+    state = dict()
+    for key, tensor in module.state_dict().items():
+        if kept_outputs is not None and tensor.dim():
+            tensor = tensor.index_select(0, kept_outputs)
+        if kept_inputs is not None and key.endswith('weight') and tensor.dim() > 1:
+            tensor = tensor.index_select(1, kept_inputs)
+        state[key] = tensor
+    return state
+
+
+@torch.no_grad()
+def prune(block: _Block, ratio: float, score: th.Optional[th.Callable[[torch.nn.Module], torch.Tensor]] = None):
+    """
+    structured pruning of the hidden widths of a block instance, the pruned blocks are re-instantiated with the
+    reduced widths and the surviving weights are copied over.
+
+    Only widths produced and consumed inside the same block are pruned, i.e. a linear/convolution followed by another
+    one whose input width matches, with only batch-norms and element-wise modules (activations, dropout) in between.
+    The inputs and outputs of every block thus keep their size and residual/dense connections and repeat slots
+    remain valid.
+
+    :param block: block instance to prune (nested blocks and repeat slots are pruned recursively)
+    :param ratio: fraction of the units to remove from each prunable sub-block
+    :param score: importance of the output units of a sub-block (defaults to the l1 norm of its weights)
+    :return: a pruned copy of the block, the provided block is left untouched
+    """
+    return _prune(block.clone(), ratio=ratio, score=score or l1_score)
+
+
+def _prune(block: _Block, ratio: float, score: th.Callable[[torch.nn.Module], torch.Tensor]):
+    """prunes the block in place, returns the block itself or its re-instantiation if its own widths changed"""
+    names = [name for name, _ in block._execution_plan()]
+    for name in names:
+        if isinstance(getattr(block, name), _Block):
+            setattr(block, name, _prune(getattr(block, name), ratio=ratio, score=score))
+    if block.repeat['count']:
+        return block
+
+    overrides, kept_outputs, kept_inputs = dict(), dict(), dict()
+    for i, name in enumerate(names):
+        args = width_args(block, name)
+        if args is None:
+            continue
+        module = getattr(block, name)
+        width = getattr(module, args[1])
+        # looking for the consumer of the outputs
+        norms, consumer, consumer_args = [], None, None
+        for candidate in names[i + 1:]:
+            candidate_module = getattr(block, candidate)
+            if is_norm(candidate_module) and candidate_module.num_features == width:
+                norms.append(candidate)
+            elif isinstance(candidate_module, ELEMENTWISE):
+                continue
+            else:
+                candidate_args = width_args(block, candidate)
+                if candidate_args is not None and getattr(candidate_module, candidate_args[0]) == width:
+                    consumer, consumer_args = candidate, candidate_args
+                break
+        if consumer is None:
+            continue
+        keep = max(1, int(round(width * (1 - ratio))))
+        if keep == width:
+            continue
+        kept = score(module).topk(keep).indices.sort().values
+        overrides[f'{name}_{args[1]}'] = overrides[f'{consumer}_{consumer_args[0]}'] = keep
+        kept_outputs[name] = kept
+        kept_inputs[consumer] = kept
+        for norm in norms:
+            overrides[f'{norm}_num_features'] = keep
+            kept_outputs[norm] = kept
+    if not overrides:
+        return block
+
+    pruned = type(block)(**{**block.build_kwargs, **overrides})
+    for name in names:
+        if name not in kept_outputs and name not in kept_inputs:
+            setattr(pruned, name, getattr(block, name))
+            continue
+        getattr(pruned, name).load_state_dict(_slice_state(
+            getattr(block, name), kept_outputs=kept_outputs.get(name, None), kept_inputs=kept_inputs.get(name, None)))
+    return pruned
@@ -0,0 +1,58 @@
+import typing as th
+import torch
+from .block import _Block
+
+
+def map_state(state, function: th.Callable[[torch.Tensor], torch.Tensor]):
+    """applies the function on every tensor of a (nested) state"""
+    if isinstance(state, dict):
+        return {name: map_state(value, function) for name, value in state.items()}
+    if isinstance(state, tuple) and hasattr(state, '_fields'):
+        return type(state)(*(map_state(value, function) for value in state))
+    if isinstance(state, (list, tuple)):
+        return type(state)(map_state(value, function) for value in state)
+    return function(state)
+
+
+class StreamStatePool:
+    def __init__(self, block: _Block, capacity: int):
+        """
+        fixed capacity pool of preallocated stream caches for incremental inference of a block.
+
+        Caches are never gathered or copied, the slots of the stepped streams are passed down to the stateful
+        sub-blocks which update the corresponding rows in place.
+
+        :param block: block instance providing init_state & step
+        :param capacity: maximum number of concurrent streams
+        """
+        self.block = block
+        self.capacity = capacity
+        self.state = block.init_state(capacity)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.live_slots = set()
+
+    def acquire(self):
+        """reserves (and resets) the caches of a new stream, returns its slot"""
+        assert self.free_slots, 'no free stream slot is left'
+        slot = self.free_slots.pop()
+        self.live_slots.add(slot)
+        map_state(self.state, lambda tensor: tensor[slot].zero_())
+        return slot
+
+    def release(self, slot: int):
+        """returns the slot of a finished stream to the pool"""
+        assert 0 <= slot < self.capacity and slot in self.live_slots, f'slot {slot} is not acquired'
+        self.live_slots.remove(slot)
+        self.free_slots.append(slot)
+
+    @torch.no_grad()
+    def step(self, inputs: torch.Tensor, slots: th.Optional[th.Union[torch.Tensor, th.List[int]]] = None):
+        """
+        runs a single timestep for the streams in the given slots (all slots if not provided).
+
+        :param inputs: timestep inputs, one row per provided slot
+        :param slots: slots of the streams to step
+        :return: timestep outputs of the streams
+        """
+        slots = torch.as_tensor(slots, dtype=torch.long) if slots is not None else None
+        return self.block.step(inputs, self.state, slots=slots)
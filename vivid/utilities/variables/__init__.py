@@ -1,2 +1,3 @@
 from .variable import Var, KWVar, VariableLookupException
 from .utils import var_args_description
+from .description import ArgDescription
@@ -0,0 +1,124 @@
+import sys
+import typing as th
+from collections.abc import Mapping
+
+
+class _Missing:
+    """marker of unset fields, pickled by reference so that it remains a singleton"""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '_MISSING'
+
+
+_MISSING = _Missing()
+FIELDS = ('kind', 'default', 'block', 'variable', 'active', 'lookup', 'var_cls')
+
+
+class _Description(Mapping):
+    """
+    read-only mapping interface shared by the argument descriptions, unset fields are not part of the mapping.
+    """
+    __slots__ = ()
+    # field name -> mapping key
+    _keys = dict(
+        kind='kind', default='default', block='block', variable='variable', active='active', lookup='lookup',
+        var_cls='VAR_CLS')
+    _fields = {key: field for field, key in _keys.items()}
+
+    def __setattr__(self, name, value):
+        raise AttributeError('argument descriptions are immutable, use replace instead')
+
+    def __delattr__(self, name):
+        raise AttributeError('argument descriptions are immutable, use replace instead')
+
+    def replace(self, **fields):
+        """new description with the given fields replaced (the remaining fields are shared)"""
+        return ArgDescription(**{
+            **{field: getattr(self, field) for field in FIELDS if getattr(self, field) is not _MISSING}, **fields})
+
+    def merge(self, other: '_Description'):
+        """equivalent of {**self, **other}"""
+        return self.replace(
+            **{field: getattr(other, field) for field in FIELDS if getattr(other, field) is not _MISSING})
+
+    def prefixed(self, block_name: str):
+        """description of the argument as seen by a parent block embedding it under block_name"""
+        return PrefixedArgDescription(block_name, self)
+
+    # mapping interface
+    def __getitem__(self, key):
+        value = getattr(self, self._fields[key]) if key in self._fields else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (key for field, key in self._keys.items() if getattr(self, field) is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{key}={value!r}" for key, value in self.items())})'
+
+
+class ArgDescription(_Description):
+    """compact immutable description of an argument"""
+    __slots__ = FIELDS
+
+    def __init__(
+            self,
+            kind: str,
+            default: th.Any = _MISSING,
+            block: th.Any = _MISSING,
+            variable: th.Any = _MISSING,
+            active: th.Any = _MISSING,
+            lookup: th.Any = _MISSING,
+            var_cls: th.Any = _MISSING,
+    ):
+        init = object.__setattr__
+        init(self, 'kind', sys.intern(kind))
+        init(self, 'default', default)
+        init(self, 'block', block if block is _MISSING else tuple(sys.intern(name) for name in block))
+        init(self, 'variable', variable)
+        init(self, 'active', active)
+        init(self, 'lookup', lookup if lookup is _MISSING else tuple(
+            sys.intern(name) if isinstance(name, str) else name for name in lookup))
+        init(self, 'var_cls', var_cls)
+
+    @classmethod
+    def from_dict(cls, description: dict):
+        return cls(**{cls._fields[key]: value for key, value in description.items()})
+
+    def __reduce__(self):
+        # slots are restored through the constructor (copy & pickle would otherwise hit the blocked __setattr__)
+        return ArgDescription, tuple(getattr(self, field) for field in FIELDS)
+
+
+class PrefixedArgDescription(_Description):
+    """
+    description of an argument of a nested block, sharing every field with the description of the nested block and
+    only prefixing its block path
+    """
+    __slots__ = ('prefix', 'base')
+
+    def __init__(self, prefix: str, base: _Description):
+        object.__setattr__(self, 'prefix', sys.intern(prefix))
+        object.__setattr__(self, 'base', base)
+
+    @property
+    def block(self):
+        block = self.base.block
+        return (self.prefix,) if block is _MISSING else (self.prefix,) + block
+
+    def __reduce__(self):
+        return PrefixedArgDescription, (self.prefix, self.base)
+
+    def __getattr__(self, name):
+        if name in FIELDS:
+            return getattr(self.base, name)
+        raise AttributeError(name)
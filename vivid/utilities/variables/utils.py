@@ -1,4 +1,5 @@
 from .variable import Var, VariableLookupException
+from .description import ArgDescription
 import typing as th
 
 
@@ -10,15 +11,15 @@ def var_args_description(
     kwargs = kwargs or dict()
     names, contexts = (var._names, var._contexts) if var.priority_lookup else (
         [var.name], [var.context])
-    description = dict(kind='VAR', variable=var, active=var.active, lookup=[])
-
+    lookup_names = []
     for i, (var_name, context) in enumerate(zip(names, contexts)):
         if context == 'kwargs' and (var_name is None or '.' not in var_name):
-            description['lookup'].append(var_name or arg_name)
+            lookup_names.append(var_name or arg_name)
+    description = ArgDescription(kind='VAR', variable=var, active=var.active, lookup=lookup_names)
     try:
         if var.is_active(prefix=block_name, name=block_name, context_level=context_level):
-            description['default'] = var._value_decorators[0](
-                name=arg_name, prefix=block_name, context_level=context_level)
+            description = description.replace(default=var._value_decorators[0](
+                name=arg_name, prefix=block_name, context_level=context_level))
     except VariableLookupException:
         pass
     return description